@@ -20,9 +20,10 @@ def analyze_category(category_path, category_name):
         print(f"No run directories found for {category_name}")
         return None
     
-    # Load data from all runs
-    run_dataframes = {}
+    identifier_cols = ['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type']
+    coordinate_dtypes = {'pcie': np.int64, 'core_x': np.int64, 'core_y': np.int64}
     
+    csv_files = []
     for run_dir in run_dirs:
         csv_file = os.path.join(category_path, run_dir, f"{category_name}.csv")
         
@@ -30,57 +31,77 @@ def analyze_category(category_path, category_name):
             print(f"Warning: {csv_file} not found, skipping...")
             continue
         
+        csv_files.append((run_dir, csv_file))
+    
+    # The identifying columns are loaded once, from the first run that can be read,
+    # every other run only contributes its KERNEL_LENGTH column
+    reference_df = None
+    kernel_matrix = None
+    num_runs = 0
+    
+    for run_dir, csv_file in csv_files:
         print(f"  Loading run {run_dir}...")
         try:
-            df = pd.read_csv(csv_file)
-            run_dataframes[int(run_dir)] = df
-            print(f"    Loaded {len(df)} records")
+            if reference_df is None:
+                reference_df = pd.read_csv(
+                    csv_file,
+                    usecols=lambda col: col in identifier_cols or col == 'KERNEL_LENGTH',
+                    dtype={**coordinate_dtypes, 'KERNEL_LENGTH': np.int64},
+                )
+                num_rows = len(reference_df)
+                print(f"    Loaded {num_rows} records")
+                
+                if 'KERNEL_LENGTH' not in reference_df.columns:
+                    break
+                
+                # Preallocate the (rows x runs) matrix and fill it one run per column
+                kernel_matrix = np.empty((num_rows, len(csv_files)), dtype=np.int64)
+                kernel_matrix[:, 0] = reference_df['KERNEL_LENGTH'].to_numpy()
+                num_runs = 1
+                continue
+            
+            kernel_lengths = pd.read_csv(csv_file, usecols=['KERNEL_LENGTH'], dtype=np.int64)['KERNEL_LENGTH'].to_numpy()
+            print(f"    Loaded {len(kernel_lengths)} records")
         except Exception as e:
             print(f"  Error reading {csv_file}: {e}")
             continue
+        
+        # Verify all runs have the same length
+        if len(kernel_lengths) != num_rows:
+            print(f"  Warning: Run {run_dir} has {len(kernel_lengths)} rows, expected {num_rows}")
+            return None
+        
+        kernel_matrix[:, num_runs] = kernel_lengths
+        num_runs += 1
     
-    if not run_dataframes:
+    if reference_df is None:
         print(f"No valid data found for {category_name}")
         return None
     
-    # Verify all dataframes have the same length and structure
-    first_run = list(run_dataframes.keys())[0]
-    reference_df = run_dataframes[first_run]
-    num_rows = len(reference_df)
-    
-    print(f"  Verifying data consistency across runs...")
-    for run_id, df in run_dataframes.items():
-        if len(df) != num_rows:
-            print(f"  Warning: Run {run_id} has {len(df)} rows, expected {num_rows}")
-            return None
-    
     print(f"  All runs have {num_rows} rows - proceeding with analysis")
     
     # Start with basic identifying columns from reference dataframe
-    result_df = reference_df[['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type']].copy()
+    result_df = reference_df[identifier_cols].copy()
     
     # Calculate row-by-row statistics for KERNEL_LENGTH
-    if 'KERNEL_LENGTH' in reference_df.columns:
+    if kernel_matrix is not None:
         print(f"  Calculating KERNEL_LENGTH statistics...")
         
-        # Collect KERNEL_LENGTH values for each row across all runs
-        kernel_values_matrix = []
-        for run_id in sorted(run_dataframes.keys()):
-            kernel_values_matrix.append(run_dataframes[run_id]['KERNEL_LENGTH'].values)
-        
-        # Convert to numpy array for easier calculation (rows x runs)
-        kernel_matrix = np.array(kernel_values_matrix).T  # Transpose so each row represents a data point
+        # Drop the columns of runs that could not be read
+        kernel_matrix = kernel_matrix[:, :num_runs]
         
         # Calculate mean and standard deviation for each row
         kernel_means = np.mean(kernel_matrix, axis=1)
-        kernel_std_devs = np.std(kernel_matrix, axis=1, ddof=1)  # Sample standard deviation
+        
+        # Sample standard deviation, reusing the means rather than having np.std compute them again
+        squared_deviations = kernel_matrix - kernel_means[:, np.newaxis]
+        np.multiply(squared_deviations, squared_deviations, out=squared_deviations)
+        kernel_std_devs = np.sqrt(np.sum(squared_deviations, axis=1) / (num_runs - 1))
         
         # Add to result dataframe
         result_df['KERNEL_LENGTH_AVG'] = kernel_means
         result_df['KERNEL_LENGTH_STD'] = kernel_std_devs
     
-
-    
     print(f"  Analysis complete - {len(result_df)} rows with statistics")
     return result_df
 
@@ -5,13 +5,8 @@ import numpy as np
 import os
 import argparse
 
-def calculate_std_percentage(input_file, output_file):
-    """Calculate standard deviation as percentage of kernel length"""
-    print(f"Processing {input_file}...")
-    
-    # Load the data
-    df = pd.read_csv(input_file)
-    
+def add_std_percentage(df):
+    """Add KERNEL_LENGTH_STD_PCT column with standard deviation as percentage of mean"""
     # Check if required columns exist
     required_cols = ['KERNEL_LENGTH_AVG', 'KERNEL_LENGTH_STD']
     missing_cols = [col for col in required_cols if col not in df.columns]
@@ -19,15 +14,32 @@ def calculate_std_percentage(input_file, output_file):
         raise ValueError(f"Missing required columns: {missing_cols}")
     
     # Calculate standard deviation as percentage of mean
-    # Handle division by zero by setting percentage to NaN where mean is 0
-    df['KERNEL_LENGTH_STD_PCT'] = np.where(
-        df['KERNEL_LENGTH_AVG'] != 0,
-        (df['KERNEL_LENGTH_STD'] / df['KERNEL_LENGTH_AVG']) * 100,
-        np.nan
-    )
+    # Handle division by zero by only dividing where mean is not 0, leaving NaN elsewhere
+    mean = df['KERNEL_LENGTH_AVG'].to_numpy()
+    std = df['KERNEL_LENGTH_STD'].to_numpy()
+    pct = np.full(mean.shape, np.nan, dtype=np.float64)
+    np.divide(std, mean, out=pct, where=mean != 0)
+    pct *= 100
     
     # Round to reasonable precision
-    df['KERNEL_LENGTH_STD_PCT'] = df['KERNEL_LENGTH_STD_PCT'].round(4)
+    np.round(pct, 4, out=pct)
+    df['KERNEL_LENGTH_STD_PCT'] = pct
+    
+    return df
+
+def calculate_std_percentage(input_file, output_file):
+    """Calculate standard deviation as percentage of kernel length"""
+    print(f"Processing {input_file}...")
+    
+    # Load the data, parsing the statistics straight to float64 instead of inferring their dtype.
+    # The round-trip parser reads back exactly the floats that were written, the default one can
+    # be off in the last digit
+    df = pd.read_csv(
+        input_file,
+        dtype={'KERNEL_LENGTH_AVG': np.float64, 'KERNEL_LENGTH_STD': np.float64},
+        float_precision='round_trip',
+    )
+    df = add_std_percentage(df)
     
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
@@ -91,58 +103,61 @@ def create_summary_report(results, output_dir):
     
     summary_file = os.path.join(output_dir, "std_percentage_summary.txt")
     
-    with open(summary_file, 'w') as f:
-        f.write("Standard Deviation Percentage Summary Report\n")
-        f.write("=" * 50 + "\n\n")
+    # Build the whole report in memory and write it out once
+    parts = []
+    parts.append("Standard Deviation Percentage Summary Report\n")
+    parts.append("=" * 50 + "\n\n")
+    
+    all_stats = {}
+    for category, df in results.items():
+        valid_pct = df['KERNEL_LENGTH_STD_PCT'].dropna()
+        zero_mean_count = (df['KERNEL_LENGTH_AVG'] == 0).sum()
         
-        for category, df in results.items():
-            valid_pct = df['KERNEL_LENGTH_STD_PCT'].dropna()
-            zero_mean_count = (df['KERNEL_LENGTH_AVG'] == 0).sum()
-            
-            f.write(f"{category.upper()} STATISTICS:\n")
-            f.write("-" * 20 + "\n")
-            f.write(f"Total rows: {len(df)}\n")
-            f.write(f"Zero mean values: {zero_mean_count}\n")
-            f.write(f"Valid percentage calculations: {len(valid_pct)}\n")
-            
-            if len(valid_pct) > 0:
-                f.write(f"STD Percentage statistics:\n")
-                f.write(f"  Mean: {valid_pct.mean():.4f}%\n")
-                f.write(f"  Median: {valid_pct.median():.4f}%\n")
-                f.write(f"  Standard Deviation: {valid_pct.std():.4f}%\n")
-                f.write(f"  Min: {valid_pct.min():.4f}%\n")
-                f.write(f"  Max: {valid_pct.max():.4f}%\n")
-                f.write(f"  25th percentile: {valid_pct.quantile(0.25):.4f}%\n")
-                f.write(f"  75th percentile: {valid_pct.quantile(0.75):.4f}%\n")
-                f.write(f"  95th percentile: {valid_pct.quantile(0.95):.4f}%\n")
-                f.write(f"  99th percentile: {valid_pct.quantile(0.99):.4f}%\n")
-            
-            f.write("\n")
+        parts.append(f"{category.upper()} STATISTICS:\n")
+        parts.append("-" * 20 + "\n")
+        parts.append(f"Total rows: {len(df)}\n")
+        parts.append(f"Zero mean values: {zero_mean_count}\n")
+        parts.append(f"Valid percentage calculations: {len(valid_pct)}\n")
         
-        # Cross-category comparison
-        if len(results) > 1:
-            f.write("CROSS-CATEGORY COMPARISON:\n")
-            f.write("-" * 25 + "\n")
+        if len(valid_pct) > 0:
+            # All percentiles, including the median, in a single call
+            p25, median, p75, p95, p99 = valid_pct.quantile([0.25, 0.5, 0.75, 0.95, 0.99]).to_numpy()
+            all_stats[category] = {
+                'mean': valid_pct.mean(),
+                'median': median,
+                'std': valid_pct.std(),
+                'count': len(valid_pct)
+            }
             
-            all_stats = {}
-            for category, df in results.items():
-                valid_pct = df['KERNEL_LENGTH_STD_PCT'].dropna()
-                if len(valid_pct) > 0:
-                    all_stats[category] = {
-                        'mean': valid_pct.mean(),
-                        'median': valid_pct.median(),
-                        'std': valid_pct.std(),
-                        'count': len(valid_pct)
-                    }
+            parts.append(f"STD Percentage statistics:\n")
+            parts.append(f"  Mean: {all_stats[category]['mean']:.4f}%\n")
+            parts.append(f"  Median: {median:.4f}%\n")
+            parts.append(f"  Standard Deviation: {all_stats[category]['std']:.4f}%\n")
+            parts.append(f"  Min: {valid_pct.min():.4f}%\n")
+            parts.append(f"  Max: {valid_pct.max():.4f}%\n")
+            parts.append(f"  25th percentile: {p25:.4f}%\n")
+            parts.append(f"  75th percentile: {p75:.4f}%\n")
+            parts.append(f"  95th percentile: {p95:.4f}%\n")
+            parts.append(f"  99th percentile: {p99:.4f}%\n")
+        
+        parts.append("\n")
+    
+    # Cross-category comparison, reusing the per-category statistics computed above
+    if len(results) > 1:
+        parts.append("CROSS-CATEGORY COMPARISON:\n")
+        parts.append("-" * 25 + "\n")
+        
+        if all_stats:
+            parts.append("Mean STD Percentage by category:\n")
+            for category, stats in all_stats.items():
+                parts.append(f"  {category}: {stats['mean']:.4f}% (n={stats['count']})\n")
             
-            if all_stats:
-                f.write("Mean STD Percentage by category:\n")
-                for category, stats in all_stats.items():
-                    f.write(f"  {category}: {stats['mean']:.4f}% (n={stats['count']})\n")
-                
-                f.write("\nMedian STD Percentage by category:\n")
-                for category, stats in all_stats.items():
-                    f.write(f"  {category}: {stats['median']:.4f}%\n")
+            parts.append("\nMedian STD Percentage by category:\n")
+            for category, stats in all_stats.items():
+                parts.append(f"  {category}: {stats['median']:.4f}%\n")
+    
+    with open(summary_file, 'w') as f:
+        f.write("".join(parts))
     
     print(f"Summary report saved to: {summary_file}")
 
@@ -8,12 +8,15 @@ import pandas as pd
 import numpy as np
 import os
 
-def calculate_percentage_slowdown(baseline_value, comparison_value):
+def calculate_percentage_slowdown(baseline_values, comparison_values):
     """Calculate percentage slowdown: (comparison - baseline) / baseline * 100
     Positive values indicate slowdown, negative values indicate speedup"""
-    if baseline_value == 0:
-        return np.nan  # Avoid division by zero
-    return ((comparison_value - baseline_value) / baseline_value) * 100
+    baseline_values = np.asarray(baseline_values, dtype=np.float64)
+    comparison_values = np.asarray(comparison_values, dtype=np.float64)
+    nonzero = baseline_values != 0
+    # Divide by 1 where baseline is 0 and mask those rows out afterwards to avoid division by zero
+    safe_baseline = np.where(nonzero, baseline_values, 1)
+    return np.where(nonzero, (comparison_values - baseline_values) / safe_baseline * 100, np.nan)
 
 def load_statistics_data(statistics_dir):
     """Load the statistics data for all categories."""
@@ -24,7 +27,17 @@ def load_statistics_data(statistics_dir):
         csv_file = os.path.join(statistics_dir, f"{category}.csv")
         if os.path.exists(csv_file):
             print(f"Loading {category} data...")
-            data[category] = pd.read_csv(csv_file)
+            # Only the identifying columns and the statistics are used, parsed with known dtypes.
+            # The round-trip parser reads back exactly the floats that were written
+            data[category] = pd.read_csv(
+                csv_file,
+                usecols=['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type', 'KERNEL_LENGTH_AVG', 'KERNEL_LENGTH_STD'],
+                dtype={
+                    'pcie': np.int8, 'core_x': np.int8, 'core_y': np.int8, 'risc_type': 'category',
+                    'KERNEL_LENGTH_AVG': np.float64, 'KERNEL_LENGTH_STD': np.float64,
+                },
+                float_precision='round_trip',
+            )
             print(f"  Loaded {len(data[category])} rows")
         else:
             print(f"Warning: {csv_file} not found")
@@ -38,53 +51,57 @@ def compare_implementations(data):
     counter_df = data['counter']
     profiler_df = data['profiler']
     
-    # Verify all dataframes have the same structure
-    if len(baseline_df) != len(counter_df) or len(baseline_df) != len(profiler_df):
-        print("Error: Dataframes have different lengths")
-        return None
-    
     print(f"Comparing {len(baseline_df)} rows across implementations...")
     
-    # Start with identifying columns from baseline
-    result_df = baseline_df[['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type']].copy()
-    
-    # Add baseline values for reference
-    result_df['BASELINE_MEAN'] = baseline_df['KERNEL_LENGTH_AVG']
-    result_df['BASELINE_STD'] = baseline_df['KERNEL_LENGTH_STD']
-    
-    # Add counter values and calculate relative errors
-    result_df['COUNTER_MEAN'] = counter_df['KERNEL_LENGTH_AVG']
-    result_df['COUNTER_STD'] = counter_df['KERNEL_LENGTH_STD']
-    
-    # Calculate percentage slowdown for counter vs baseline
-    result_df['COUNTER_MEAN_SLOWDOWN_PCT'] = [
-        calculate_percentage_slowdown(baseline_df['KERNEL_LENGTH_AVG'].iloc[i], 
-                                    counter_df['KERNEL_LENGTH_AVG'].iloc[i])
-        for i in range(len(baseline_df))
-    ]
-    
-    result_df['COUNTER_STD_CHANGE_PCT'] = [
-        calculate_percentage_slowdown(baseline_df['KERNEL_LENGTH_STD'].iloc[i], 
-                                    counter_df['KERNEL_LENGTH_STD'].iloc[i])
-        for i in range(len(baseline_df))
-    ]
-    
-    # Add profiler values and calculate relative errors
-    result_df['PROFILER_MEAN'] = profiler_df['KERNEL_LENGTH_AVG']
-    result_df['PROFILER_STD'] = profiler_df['KERNEL_LENGTH_STD']
-    
-    # Calculate percentage slowdown for profiler vs baseline
-    result_df['PROFILER_MEAN_SLOWDOWN_PCT'] = [
-        calculate_percentage_slowdown(baseline_df['KERNEL_LENGTH_AVG'].iloc[i], 
-                                    profiler_df['KERNEL_LENGTH_AVG'].iloc[i])
-        for i in range(len(baseline_df))
-    ]
+    # Align counter and profiler rows to baseline by their identifying columns instead of by position
+    identifier_cols = ['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type']
+    stat_cols = ['KERNEL_LENGTH_AVG', 'KERNEL_LENGTH_STD']
+    baseline_keys = pd.MultiIndex.from_frame(baseline_df[identifier_cols])
+    if not baseline_keys.is_unique:
+        print("Error: baseline data has duplicate identifying columns")
+        return None
     
-    result_df['PROFILER_STD_CHANGE_PCT'] = [
-        calculate_percentage_slowdown(baseline_df['KERNEL_LENGTH_STD'].iloc[i], 
-                                    profiler_df['KERNEL_LENGTH_STD'].iloc[i])
-        for i in range(len(baseline_df))
-    ]
+    aligned = {}
+    for category, df in [('counter', counter_df), ('profiler', profiler_df)]:
+        keys = pd.MultiIndex.from_frame(df[identifier_cols])
+        if not keys.is_unique:
+            print(f"Error: {category} data has duplicate identifying columns")
+            return None
+        
+        unmatched_count = (~baseline_keys.isin(keys)).sum()
+        if unmatched_count:
+            print(f"  Warning: {unmatched_count} baseline rows have no matching {category} row")
+        
+        # Rows missing from baseline have nothing to compare against and are left out
+        extra_count = (~keys.isin(baseline_keys)).sum()
+        if extra_count:
+            print(f"  Warning: {extra_count} {category} rows have no matching baseline row and are dropped")
+        
+        aligned[category] = df[stat_cols].set_axis(keys).reindex(baseline_keys)
+    
+    # Extract the raw arrays once so the percentages are computed column-wise
+    baseline_mean = baseline_df['KERNEL_LENGTH_AVG'].to_numpy()
+    baseline_std = baseline_df['KERNEL_LENGTH_STD'].to_numpy()
+    counter_mean = aligned['counter']['KERNEL_LENGTH_AVG'].to_numpy()
+    counter_std = aligned['counter']['KERNEL_LENGTH_STD'].to_numpy()
+    profiler_mean = aligned['profiler']['KERNEL_LENGTH_AVG'].to_numpy()
+    profiler_std = aligned['profiler']['KERNEL_LENGTH_STD'].to_numpy()
+    
+    # Build the result in one go: identifying columns from baseline, then baseline values for
+    # reference, then counter and profiler values with their percentage slowdown vs baseline
+    result_df = pd.DataFrame({
+        **{col: baseline_df[col].to_numpy() for col in identifier_cols},
+        'BASELINE_MEAN': baseline_mean,
+        'BASELINE_STD': baseline_std,
+        'COUNTER_MEAN': counter_mean,
+        'COUNTER_STD': counter_std,
+        'COUNTER_MEAN_SLOWDOWN_PCT': calculate_percentage_slowdown(baseline_mean, counter_mean),
+        'COUNTER_STD_CHANGE_PCT': calculate_percentage_slowdown(baseline_std, counter_std),
+        'PROFILER_MEAN': profiler_mean,
+        'PROFILER_STD': profiler_std,
+        'PROFILER_MEAN_SLOWDOWN_PCT': calculate_percentage_slowdown(baseline_mean, profiler_mean),
+        'PROFILER_STD_CHANGE_PCT': calculate_percentage_slowdown(baseline_std, profiler_std),
+    }, copy=False)
     
     return result_df
 
@@ -92,33 +109,27 @@ def calculate_summary_statistics(comparison_df):
     """Calculate overall summary statistics for the comparison."""
     summary_stats = {}
     
-    # Counter vs Baseline
-    counter_mean_slowdown = comparison_df['COUNTER_MEAN_SLOWDOWN_PCT'].dropna()
-    counter_std_change = comparison_df['COUNTER_STD_CHANGE_PCT'].dropna()
-    
-    summary_stats['counter'] = {
-        'mean_slowdown_avg': counter_mean_slowdown.mean(),
-        'mean_slowdown_std': counter_mean_slowdown.std(),
-        'mean_slowdown_median': counter_mean_slowdown.median(),
-        'std_change_avg': counter_std_change.mean(),
-        'std_change_std': counter_std_change.std(),
-        'std_change_median': counter_std_change.median(),
-        'count': len(counter_mean_slowdown)
-    }
-    
-    # Profiler vs Baseline
-    profiler_mean_slowdown = comparison_df['PROFILER_MEAN_SLOWDOWN_PCT'].dropna()
-    profiler_std_change = comparison_df['PROFILER_STD_CHANGE_PCT'].dropna()
-    
-    summary_stats['profiler'] = {
-        'mean_slowdown_avg': profiler_mean_slowdown.mean(),
-        'mean_slowdown_std': profiler_mean_slowdown.std(),
-        'mean_slowdown_median': profiler_mean_slowdown.median(),
-        'std_change_avg': profiler_std_change.mean(),
-        'std_change_std': profiler_std_change.std(),
-        'std_change_median': profiler_std_change.median(),
-        'count': len(profiler_mean_slowdown)
-    }
+    # Aggregate all four percentage columns in one call, NaNs are skipped by the reducers themselves
+    pct_cols = [
+        'COUNTER_MEAN_SLOWDOWN_PCT', 'COUNTER_STD_CHANGE_PCT',
+        'PROFILER_MEAN_SLOWDOWN_PCT', 'PROFILER_STD_CHANGE_PCT'
+    ]
+    stats = comparison_df[pct_cols].agg(['mean', 'std', 'median', 'count'])
+    
+    # Counter vs Baseline, then Profiler vs Baseline
+    for impl in ['counter', 'profiler']:
+        mean_slowdown = stats[f'{impl.upper()}_MEAN_SLOWDOWN_PCT']
+        std_change = stats[f'{impl.upper()}_STD_CHANGE_PCT']
+        
+        summary_stats[impl] = {
+            'mean_slowdown_avg': mean_slowdown['mean'],
+            'mean_slowdown_std': mean_slowdown['std'],
+            'mean_slowdown_median': mean_slowdown['median'],
+            'std_change_avg': std_change['mean'],
+            'std_change_std': std_change['std'],
+            'std_change_median': std_change['median'],
+            'count': int(mean_slowdown['count'])
+        }
     
     return summary_stats
 
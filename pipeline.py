@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Script to run the analysis half of the pipeline in memory.
+Computes per-category statistics from the unified folder, the standard deviation
+percentages and the implementation comparison without writing the intermediate
+statistics files in between.
+"""
+
+import os
+import argparse
+
+from analyze_statistics import analyze_category
+from calculate_std_percentage import add_std_percentage, create_summary_report
+from compare_implementations import compare_implementations, calculate_summary_statistics, save_comparison_results
+
+def run_all(unified_dir, output_dir):
+    """Analyze every category in unified_dir and compare the implementations, keeping all stages in memory."""
+    categories = ['baseline', 'counter', 'profiler']
+    
+    print(f"Input directory: {unified_dir}")
+    print(f"Output directory: {output_dir}")
+    print("-" * 50)
+    
+    results = {}
+    for category in categories:
+        category_path = os.path.join(unified_dir, category)
+        
+        if not os.path.exists(category_path):
+            print(f"Category directory not found: {category_path}")
+            return None
+        
+        result_df = analyze_category(category_path, category)
+        if result_df is None:
+            return None
+        
+        results[category] = add_std_percentage(result_df)
+        print("-" * 50)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    create_summary_report(results, output_dir)
+    
+    comparison_df = compare_implementations(results)
+    if comparison_df is None:
+        return None
+    
+    summary_stats = calculate_summary_statistics(comparison_df)
+    save_comparison_results(comparison_df, summary_stats, output_dir)
+    
+    return comparison_df
+
+def main():
+    parser = argparse.ArgumentParser(description='Run statistics, std percentage and implementation comparison in memory')
+    parser.add_argument('--input', '-i', default='unified', 
+                      help='Input directory containing unified files (default: unified)')
+    parser.add_argument('--output', '-o', default='comparison', 
+                      help='Output directory for comparison results (default: comparison)')
+    
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: Input directory {args.input} does not exist")
+        return 1
+    
+    if run_all(args.input, args.output) is None:
+        print("Pipeline failed. Exiting.")
+        return 1
+    
+    print("\nPipeline complete!")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,10 +1,28 @@
 #!/usr/bin/env python3
 
 import os
-import glob
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+KERNEL_ZONE = 'TRISC-KERNEL'
+
+# CB-COMPUTE zones and the output column each one is summed into
+CB_ZONES = {
+    'CB-COMPUTE-WAIT-FRONT': 'CB_WAIT_FRONT',
+    'CB-COMPUTE-RESERVE-BACK': 'CB_RESERVE_BACK',
+}
+
+def find_device_profiler_logs(directory):
+    """Recursively yield every profile_log_device.csv under directory"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from find_device_profiler_logs(entry.path)
+            elif entry.name == "profile_log_device.csv":
+                yield entry.path
 
 def device_profiler_log_files(base_dir):
     files = []
@@ -14,93 +32,115 @@ def device_profiler_log_files(base_dir):
         reports_dir = os.path.join(subdir_path, "reports")
         print(f"Processing {reports_dir}")
         if os.path.isdir(reports_dir):
-            for root, _, _ in os.walk(reports_dir):
-                files.extend(glob.glob(os.path.join(root, "profile_log_device.csv")))
+            files.extend(find_device_profiler_logs(reports_dir))
     return sorted(files)
 
-def calculate_kernel_length(group):
-    """Calculate KERNEL_LENGTH by finding ZONE_START and ZONE_END pairs"""
-    zone_start = group[(group['zone_name'] == 'TRISC-KERNEL') & (group['type'] == 'ZONE_START')]
-    zone_end = group[(group['zone_name'] == 'TRISC-KERNEL') & (group['type'] == 'ZONE_END')]
-    
-
-    if len(zone_start) == 0 or len(zone_end) == 0:
-        print(f"Warning: {group} has no ZONE_START or ZONE_END")
-        return 0
-
-    if len(zone_start) > 1 or len(zone_end) > 1:
-        print(f"Warning: {group} has multiple ZONE_START or ZONE_END")
-        return 0
-
-    # Get the latest start and end times for this zone
-    start_time = zone_start['time_cycles'].max()
-    end_time = zone_end['time_cycles'].max()
-    return end_time - start_time
-
-
-def extract_cb_metrics(df):
-    """Extract CB-COMPUTE metrics if they exist"""
-    cb_wait_front = df[df['zone_name'] == 'CB-COMPUTE-WAIT-FRONT']
-    cb_reserve_back = df[df['zone_name'] == 'CB-COMPUTE-RESERVE-BACK']
-    
+def calculate_kernel_length(df, group_keys, input_file):
+    """Calculate KERNEL_LENGTH per group by finding TRISC-KERNEL ZONE_START and ZONE_END pairs"""
+    kernel = df[df['zone_name'] == KERNEL_ZONE]
+
+    # Count and latest time of each marker per group, aligned to every group that has the zone
+    groups = kernel.groupby(group_keys, observed=True).size().index
+    counts = {}
+    times = {}
+    for marker in ['ZONE_START', 'ZONE_END']:
+        markers = kernel[kernel['type'] == marker].groupby(group_keys, observed=True)['time_cycles'].agg(['max', 'size'])
+        markers = markers.reindex(groups)
+        counts[marker] = markers['size'].fillna(0)
+        times[marker] = markers['max']
+    counts = pd.DataFrame(counts)
+
+    # Only the group key is reported for malformed groups, never the group rows themselves
+    missing = (counts == 0).any(axis=1)
+    multiple = (counts > 1).any(axis=1)
+    for key in counts.index[missing]:
+        print(f"Warning: {key} in {input_file} has no ZONE_START or ZONE_END")
+    for key in counts.index[multiple & ~missing]:
+        print(f"Warning: {key} in {input_file} has multiple ZONE_START or ZONE_END")
+
+    kernel_length = (times['ZONE_END'] - times['ZONE_START']).where(~(missing | multiple), 0).rename('KERNEL_LENGTH')
+    # A blank cycle count leaves its length empty, so the lengths are only integers when all are known
+    return kernel_length if kernel_length.isna().any() else kernel_length.astype('int64')
+
+
+def extract_cb_metrics(df, group_keys, groups):
+    """Extract CB-COMPUTE metrics for each of groups if they exist"""
     metrics = {}
-    
-    if not cb_wait_front.empty:
+    for zone, column in CB_ZONES.items():
         # Use the 'data' column (column 7) for CB timing information
-        metrics['CB_WAIT_FRONT'] = cb_wait_front['data'].sum()
-    
-    if not cb_reserve_back.empty:
-        # Use the 'data' column (column 7) for CB timing information  
-        metrics['CB_RESERVE_BACK'] = cb_reserve_back['data'].sum()
-    
-    return metrics
+        zone_sums = df[df['zone_name'] == zone].groupby(group_keys, observed=True)['data'].sum().reindex(groups)
+        # A zone that occurs in none of the groups gets no column, and the sums stay integers
+        # unless some group lacks the zone
+        if zone_sums.notna().any():
+            metrics[column] = zone_sums
+    return pd.DataFrame(metrics, index=groups)
 
 def transform_profile_file(input_file, output_file):
     """Transform a single profile_log_device.csv file"""
     try:
-        # Read CSV, skipping the first line with ARCH info
-        df = pd.read_csv(input_file, skiprows=1, header=0)
-        
         # Rename columns based on the CSV structure we analyzed
         expected_columns = [
             'pcie', 'core_x', 'core_y', 'risc_type', 'timer_id', 
             'time_cycles', 'data', 'run_host_id', 'zone_name', 'type', 
             'source_line', 'source_file', 'meta_data'
         ]
+        # Only these columns are needed for the metrics, the rest are never parsed
+        used_columns = [
+            'pcie', 'core_x', 'core_y', 'risc_type', 'time_cycles',
+            'data', 'run_host_id', 'zone_name', 'type'
+        ]
         
-        if len(df.columns) >= len(expected_columns):
-            df.columns = expected_columns[:len(df.columns)]
-        else:
+        # Read just the header first, skipping the first line with ARCH info
+        header = pd.read_csv(input_file, skiprows=1, nrows=0)
+        if len(header.columns) < len(expected_columns):
             print(f"Warning: {input_file} has fewer columns than expected")
             return False
         
-        # Filter out BRISC and NCRISC processors - keep only TRISC
-        filter_risc_type = df['risc_type'].str.contains('TRISC', na=False)
-        df = df[filter_risc_type]
-
-        # Group by core, risc_type, and run_host_id to calculate metrics per processor
-        grouped = df.groupby(['pcie', 'core_x', 'core_y', 'risc_type', 'run_host_id'])
-
-        # Remove groups that don't contain the TRISC-KERNEL zone
-        def group_contains_trisc_kernel(group):
-            return (group['zone_name'] == 'TRISC-KERNEL').any()
-
-        # Filter the grouped object to only include groups with TRISC-KERNEL zone
-        grouped = {k: g for k, g in grouped if group_contains_trisc_kernel(g)}
-
-
-        result_df = pd.DataFrame([
-            {
-                'pcie': pcie,
-                'core_x': core_x,
-                'core_y': core_y,
-                'risc_type': risc_type,
-                'host_id': run_host_id,
-                'KERNEL_LENGTH': calculate_kernel_length(group),
-                **extract_cb_metrics(group)
-            }
-            for (pcie, core_x, core_y, risc_type, run_host_id), group in grouped.items()
-        ])
+        # Stream the file in chunks and keep only the rows of each chunk that are needed:
+        # filter out BRISC and NCRISC processors - keep only TRISC - and drop every zone
+        # that no metric uses, so the full file is never held in memory
+        chunks = []
+        for chunk in pd.read_csv(
+            input_file,
+            skiprows=1,
+            header=0,
+            names=expected_columns,
+            usecols=used_columns,
+            dtype={'risc_type': 'category', 'zone_name': 'category', 'type': 'category'},
+            chunksize=500_000,
+        ):
+            filter_risc_type = chunk['risc_type'].str.contains('TRISC', na=False)
+            filter_zone = chunk['zone_name'].isin([KERNEL_ZONE, *CB_ZONES])
+            chunk = chunk[filter_risc_type & filter_zone]
+
+            # The key columns are only narrowed once the rows are filtered, so a blank field in a
+            # row that is dropped anyway cannot fail the file. Rows with a blank key are dropped,
+            # just as grouping on them would
+            chunk = chunk.dropna(subset=['pcie', 'core_x', 'core_y', 'run_host_id'])
+            chunks.append(chunk.astype({'pcie': np.int8, 'core_x': np.int8, 'core_y': np.int8, 'run_host_id': np.int64}))
+        df = pd.concat(chunks, ignore_index=True)
+
+        # Chunks with different category sets concatenate to plain strings, so restore the categoricals
+        categorical_columns = ['risc_type', 'zone_name', 'type']
+        df[categorical_columns] = df[categorical_columns].astype('category')
+
+        # Group by core, risc_type, and run_host_id to calculate metrics per processor.
+        # Only groups that contain the TRISC-KERNEL zone are kept.
+        group_keys = ['pcie', 'core_x', 'core_y', 'risc_type', 'run_host_id']
+        kernel_length = calculate_kernel_length(df, group_keys, input_file)
+        groups = kernel_length.index
+        cb_metrics = extract_cb_metrics(df, group_keys, groups)
+
+        # Build the result columnar from the typed group keys and metric arrays in a single constructor
+        result_df = pd.DataFrame({
+            'pcie': groups.get_level_values('pcie'),
+            'core_x': groups.get_level_values('core_x'),
+            'core_y': groups.get_level_values('core_y'),
+            'risc_type': groups.get_level_values('risc_type'),
+            'host_id': groups.get_level_values('run_host_id'),
+            'KERNEL_LENGTH': kernel_length.to_numpy(),
+            **{col: cb_metrics[col].to_numpy() for col in cb_metrics.columns},
+        })
         
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
@@ -115,19 +155,18 @@ def transform_profile_file(input_file, output_file):
         print(f"Error processing {input_file}: {e}")
         return False
 
-def transform_directory(input_dir, output_dir):
+def transform_directory(input_dir, output_dir, jobs=None):
     """Transform all profile_log_device.csv files maintaining directory structure"""
     files = device_profiler_log_files(input_dir)
+    output_files = [os.path.join(output_dir, os.path.relpath(input_file, input_dir)) for input_file in files]
     
+    # Files are independent of each other, so transform them in parallel worker processes.
+    # Like unify.py, a jobs value of 0 means one per CPU and there is always at least one
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(files)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(transform_profile_file, files, output_files))
     
-    success_count = 0
-    for input_file in files:
-        rel_path = os.path.relpath(input_file, input_dir)
-        output_file = os.path.join(output_dir, rel_path)
-        
-        if transform_profile_file(input_file, output_file):
-            success_count += 1
-    
+    success_count = sum(results)
     print(f"Successfully transformed {success_count}/{len(files)} files")
 
 def main():
@@ -136,6 +175,8 @@ def main():
                       help='Input directory containing runs (default: runs)')
     parser.add_argument('--output', '-o', default='processed', 
                       help='Output directory for processed files (default: processed)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                      help='Number of worker processes (default: number of CPUs)')
     
     args = parser.parse_args()
     
@@ -156,7 +197,7 @@ def main():
         output_subdir = os.path.join(output_dir, subdir)
         
         print(f"\nProcessing {subdir} directory...")
-        transform_directory(input_subdir, output_subdir)
+        transform_directory(input_subdir, output_subdir, args.jobs)
         
 if __name__ == "__main__":
     main()
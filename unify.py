@@ -1,31 +1,44 @@
 #!/usr/bin/env python3
 
 import os
-import glob
+import sys
+import csv
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import argparse
+import importlib.util
 import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
 
 def find_profile_files(base_dir):
     """Find all profile_log_device.csv files in the directory tree, sorted alphabetically, ignoring .logs files"""
     files = []
-    for root, _, _ in os.walk(base_dir):
-        found_files = glob.glob(os.path.join(root, "profile_log_device.csv"))
-        # Filter out .logs files
-        filtered_files = [f for f in found_files if '.logs' not in f]
-        files.extend(filtered_files)
+    directories = [base_dir]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # Skip .logs directories entirely rather than filtering their files afterwards
+                    if '.logs' not in entry.name:
+                        directories.append(entry.path)
+                elif entry.name == "profile_log_device.csv":
+                    files.append(entry.path)
     return sorted(files)
 
 def extract_run_info(file_index):
     """Generate run identifier based on file order"""
     return f"{file_index + 1}"
 
-def extract_host_id_from_csv(file_path):
-    """Extract host_id from CSV file content"""
+def read_leading_lines(file_path):
+    """Read the first three lines of a file, the most that is ever inspected before the full read"""
     with open(file_path, 'r') as f:
-        lines = f.readlines()
+        return [line for line in (f.readline(), f.readline(), f.readline()) if line]
 
+def extract_host_id_from_lines(lines):
+    """Extract host_id from the leading lines of a CSV file"""
     # Check if this is a .logs file format (has header in line 2)
     if len(lines) >= 3 and 'run host ID' in lines[1]:
         # Parse header to find host_id column index
@@ -38,79 +51,191 @@ def extract_host_id_from_csv(file_path):
         
         # Get host_id from first data row
         data_row = lines[2].strip().split(',')
+        if host_id_idx >= len(data_row):
+            raise ValueError("first data row has no run host ID field")
         return data_row[host_id_idx]
     
-    # For processed files, read as pandas and get host_id
-    df = pd.read_csv(file_path, nrows=1)
-    return str(df['host_id'].iloc[0])
+    # For processed files, take host_id from the header and the first data row directly
+    # rather than setting up a pandas parser for a single field
+    reader = csv.reader(lines[:2])
+    header = next(reader, [])
+    data_row = next(reader, [])
+    if 'host_id' not in header:
+        raise ValueError("file has no host_id or run host ID column")
+    host_id_idx = header.index('host_id')
+    if host_id_idx >= len(data_row):
+        raise ValueError("file has no data row to take host_id from")
+    return data_row[host_id_idx]
 
-def join_files(input_dir, output_dir, category):
-    """Join all profile_log_device.csv files from input_dir and save as [category].csv in output_dir"""
+def peek_profile_file(file_path):
+    """Return the columns of a profile file, and its host_id if it has no host_id column"""
+    # The header and the host_id both come from the leading lines, so the file is opened once
+    lines = read_leading_lines(file_path)
+    header = next(csv.reader(lines[:1]), [])
+    if not header:
+        raise ValueError("No columns to parse from file")
+    
+    host_id = None if 'host_id' in header else extract_host_id_from_lines(lines)
+    return header, host_id
+
+def read_profile_file(file_index, file_path, host_id=None, engine='c'):
+    """Read one processed profile file with the given CSV engine and add its run and host identifiers"""
+    if engine == 'pyarrow':
+        df = pd.read_csv(file_path, engine='pyarrow')
+    else:
+        # Read regular processed files in a single pass of the C parser, instead of the
+        # default low-memory mode that parses in internal chunks and merges their dtypes
+        df = pd.read_csv(file_path, engine='c', low_memory=False)
+
+    # Both identifiers are constant within a file, so store them as single-category
+    # categoricals (one int8 code per row) instead of repeating a Python string per row
+    constant_codes = np.zeros(len(df), dtype=np.int8)
+    
+    # Add run identifier
+    df['run_id'] = pd.Categorical.from_codes(constant_codes, categories=[extract_run_info(file_index)])
+    
+    # Add host_id if not already present, using the value peeked from the file beforehand
+    if host_id is not None:
+        df['host_id'] = pd.Categorical.from_codes(constant_codes, categories=[host_id])
+    
+    return df
+
+def read_profile_files(files, workers=None, engine='c'):
+    """Read (file_index, file_path, host_id, peek_error) entries concurrently, yielding their futures in file order"""
+    # The CSV parser releases the GIL so the reads overlap. At most one read per worker is
+    # kept ahead of the consumer, so memory stays bounded by a few files rather than all of them
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file_index, file_path, host_id, peek_error in files:
+            # A file whose header could not be read fails in its own place in the order
+            if peek_error is not None:
+                future = Future()
+                future.set_exception(peek_error)
+            else:
+                future = executor.submit(read_profile_file, file_index, file_path, host_id, engine)
+            pending.append((file_index, file_path, future))
+            if len(pending) > workers:
+                yield pending.popleft()
+        yield from pending
+
+def joined_frames(files, messages, reader_threads=None, csv_engine='c'):
+    """Yield every readable file as a frame, in file order, logging each one to messages"""
+    for file_index, file_path, future in read_profile_files(files, reader_threads, csv_engine):
+        try:
+            df = future.result()
+            
+            run_id = extract_run_info(file_index)
+            host_id_info = df['host_id'].iloc[0]
+            messages.append(f"  Added {len(df)} rows from {run_id} (host_id: {host_id_info})")
+            
+        except Exception as e:
+            messages.append(f"  Error reading {file_path}: {e}")
+            continue
+        
+        yield df
+
+def join_files(input_dir, output_dir, category, output_format='csv', reader_threads=None, csv_engine='c'):
+    """Join all profile_log_device.csv files from input_dir and save as [category].csv (or .parquet) in output_dir"""
+    # The log is collected and written in one go, so the logs of runs joined in parallel
+    # worker processes never interleave
+    messages = []
+    try:
+        return write_joined_files(input_dir, output_dir, category, output_format, reader_threads, csv_engine, messages)
+    finally:
+        sys.stdout.write(''.join(f"{message}\n" for message in messages))
+        sys.stdout.flush()
+
+def write_joined_files(input_dir, output_dir, category, output_format, reader_threads, csv_engine, messages):
+    """Join the files of one run into a single output file, logging progress to messages"""
     
     # Find all profile_log_device.csv files in the input directory
     files = find_profile_files(input_dir)
     
     if not files:
-        print(f"Warning: No profile_log_device.csv files found in {input_dir}")
+        messages.append(f"Warning: No profile_log_device.csv files found in {input_dir}")
         return False
     
-    print(f"Processing {len(files)} profile_log_device.csv files for {category} category...")
-    
-    # Store all dataframes
-    all_dfs = []
+    messages.append(f"Processing {len(files)} profile_log_device.csv files for {category} category...")
     
+    # Read only the headers first to get the union of all columns in order of first appearance,
+    # so each file can be streamed to the output as soon as it is read. Files without a host_id
+    # column have it peeked here too, so the full read never has to open them a second time.
+    # Errors are kept with their file and reported when it is reached, so the log stays in file order
+    # A dict keeps first-appearance order with constant-time membership checks
+    cols = {}
+    scanned_files = []
     for file_index, file_path in enumerate(files):
         try:
-            # Read regular processed files
-            df = pd.read_csv(file_path)
-            
-            # Add run identifier
-            run_id = extract_run_info(file_index)
-            df['run_id'] = run_id
-            
-            # Add host_id if not already present
-            if 'host_id' not in df.columns:
-                host_id = extract_host_id_from_csv(file_path)
-                df['host_id'] = host_id
-            
-            all_dfs.append(df)
-            host_id_info = df['host_id'].iloc[0]
-            print(f"  Added {len(df)} rows from {run_id} (host_id: {host_id_info})")
-            
+            header, host_id = peek_profile_file(file_path)
         except Exception as e:
-            print(f"  Error reading {file_path}: {e}")
+            scanned_files.append((file_index, file_path, None, e))
+            continue
+        
+        cols.update(dict.fromkeys(header))
+        scanned_files.append((file_index, file_path, host_id, None))
     
-    if not all_dfs:
-        print(f"No valid files found in {input_dir}")
+    if not cols:
+        for _, file_path, _, peek_error in scanned_files:
+            messages.append(f"  Error reading {file_path}: {peek_error}")
+        messages.append(f"No valid files found in {input_dir}")
         return False
     
-    # Concatenate all dataframes
-    # This will automatically handle different column structures by filling missing columns with NaN
-    combined_df = pd.concat(all_dfs, ignore_index=True, sort=False)
+    # Every file gets run_id and host_id added when it is read
+    cols.update(dict.fromkeys(['run_id', 'host_id']))
     
     # Reorder columns to put identifiers first
-    cols = combined_df.columns.tolist()
     identifier_cols = ['run_id', 'host_id', 'pcie', 'core_x', 'core_y', 'risc_type']
-    other_cols = [col for col in cols if col not in identifier_cols]
+    identifier_set = set(identifier_cols)
+    other_cols = [col for col in cols if col not in identifier_set]
     
     # Ensure all identifier columns exist
-    final_cols = []
-    for col in identifier_cols:
-        if col in cols:
-            final_cols.append(col)
+    final_cols = [col for col in identifier_cols if col in cols]
     final_cols.extend(other_cols)
     
-    combined_df = combined_df[final_cols]
-    
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Save the combined file
-    output_file = os.path.join(output_dir, f"{category}.csv")
-    combined_df.to_csv(output_file, index=False)
+    frames = joined_frames(scanned_files, messages, reader_threads, csv_engine)
+    total_rows = 0
+    written_files = 0
+    
+    if output_format == 'parquet':
+        # Parquet is written as a single table, so the frames are collected first. The concat
+        # and the reindex fill the columns a file lacks with NaN for the whole table at once
+        output_file = os.path.join(output_dir, f"{category}.parquet")
+        frames = list(frames)
+        if frames:
+            combined_df = pd.concat(frames, ignore_index=True, sort=False)
+            combined_df.reindex(columns=final_cols).to_parquet(output_file, index=False, compression='zstd')
+            total_rows = len(combined_df)
+            written_files = len(frames)
+    else:
+        # Write the header once, then append every file in order as it is read. A 1 MiB
+        # buffer keeps the many small chunks to_csv emits from each becoming a write call
+        output_file = os.path.join(output_dir, f"{category}.csv")
+        with open(output_file, 'w', buffering=1 << 20, newline='') as output:
+            pd.DataFrame(columns=final_cols).to_csv(output, index=False)
+            
+            for df in frames:
+                # Columns this file lacks are added as NaN in place; to_csv puts the columns in
+                # final order itself, so the frame is never copied just to reorder it
+                for col in final_cols:
+                    if col not in df.columns:
+                        df[col] = np.nan
+                df.to_csv(output, header=False, index=False, columns=final_cols)
+                total_rows += len(df)
+                written_files += 1
+        
+        if not written_files:
+            os.remove(output_file)
+    
+    if not written_files:
+        messages.append(f"No valid files found in {input_dir}")
+        return False
     
-    print(f"Created {output_file} with {len(combined_df)} total rows")
-    print(f"  Columns: {', '.join(combined_df.columns)}")
+    messages.append(f"Created {output_file} with {total_rows} total rows")
+    messages.append(f"  Columns: {', '.join(final_cols)}")
     
     return True
 
@@ -120,9 +245,22 @@ def main():
                       help='Input directory containing processed files (default: processed)')
     parser.add_argument('--output', '-o', default='unified', 
                       help='Output directory for unified files (default: unified)')
+    parser.add_argument('--format', '-f', choices=['csv', 'parquet'], default='csv',
+                      help='Output file format (default: csv). parquet requires pyarrow or fastparquet and is '
+                           'export-only, analyze_statistics.py and pipeline.py read the csv files')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                      help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--csv-engine', choices=['c', 'pyarrow'], default='c',
+                      help='pandas engine for reading the processed files, pyarrow requires pyarrow (default: c)')
     
     args = parser.parse_args()
     
+    # Fail before any file is parsed rather than in every worker once its run has been read
+    if args.format == 'parquet' and not any(importlib.util.find_spec(engine) for engine in ['pyarrow', 'fastparquet']):
+        parser.error("--format parquet requires pyarrow or fastparquet to be installed")
+    if args.csv_engine == 'pyarrow' and not importlib.util.find_spec('pyarrow'):
+        parser.error("--csv-engine pyarrow requires pyarrow to be installed")
+    
     input_root = Path(args.input)
     output_root = Path(args.output)
     
@@ -131,13 +269,12 @@ def main():
         return
 
     categories = ['baseline', 'counter', 'profiler']
-    success_count = 0
     
+    # Gather every (category, run) pair first, each one is joined independently of the others
+    input_dirs = []
+    output_dirs = []
+    run_categories = []
     for category in categories:
-        print(f"\n{'='*50}")
-        print(f"Processing {category.upper()} category")
-        print(f"{'='*50}")
-        
         category_dir = input_root / category
         if not category_dir.exists():
             continue
@@ -148,20 +285,34 @@ def main():
 
             run = run_dir.name
 
-            input_dir = run_dir
-
             output_dir = output_root / category / run
             os.makedirs(output_dir, exist_ok=True)
 
-            success = join_files(input_dir, output_dir, category)
-            
-            if success:
-                success_count += 1
-
+            input_dirs.append(run_dir)
+            output_dirs.append(output_dir)
+            run_categories.append(category)
+    
+    print(f"\n{'='*50}")
+    print(f"Processing {len(input_dirs)} runs across {', '.join(category.upper() for category in categories)} categories")
+    print(f"{'='*50}")
+    
+    # Join the runs in parallel worker processes, so their CSV parsing is not serialized on one core.
+    # The CPUs are split between the workers, each one reads the files of its run with its share
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(args.jobs or cpu_count, len(input_dirs)))
+    # Arrow already parses each file with its own thread pool, so it gets a single reader thread
+    reader_threads = 1 if args.csv_engine == 'pyarrow' else max(1, cpu_count // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            join_files, input_dirs, output_dirs, run_categories,
+            repeat(args.format), repeat(reader_threads), repeat(args.csv_engine),
+        ))
+    
+    success_count = sum(results)
 
     print(f"\n{'='*50}")
-    print(f"SUMMARY: Successfully processed {success_count}/{len(categories)} categories")
-    print(f"Output files created in: {output_dir}")
+    print(f"SUMMARY: Successfully processed {success_count}/{len(input_dirs)} runs")
+    print(f"Output files created in: {output_root}")
     print(f"{'='*50}")
 
 if __name__ == "__main__":